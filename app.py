@@ -10,7 +10,8 @@ import mimetypes
 import config 
 from cachetools import LRUCache
 from fastapi.responses import StreamingResponse
-from shared import init_db, get_db
+from starlette.routing import Route
+from shared import init_db, get_db, SQLiteConnectionPool, ALLOWED_API_KEYS
 from routers import buckets as buckets_router # Import the bucket router
 from routers import objects as objects_router
 
@@ -24,7 +25,7 @@ async def verify_api_key(api_key_from_header: str = Header(None, alias=config.AP
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"API Key required in '{config.API_KEY_HEADER_NAME}' header"
         )
-    if api_key_from_header not in config.ALLOWED_API_KEYS:
+    if api_key_from_header not in ALLOWED_API_KEYS:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API Key provided"
@@ -32,13 +33,16 @@ async def verify_api_key(api_key_from_header: str = Header(None, alias=config.AP
     return api_key_from_header 
 
 @asynccontextmanager
-async def lifespan(app_instance: FastAPI): 
+async def lifespan(app_instance: FastAPI):
     print("Application startup...")
-    os.makedirs(config.DATA_DIR_BASE, exist_ok=True) 
-    init_db() 
+    os.makedirs(config.DATA_DIR_BASE, exist_ok=True)
+    init_db()
+    app_instance.state.db_pool = SQLiteConnectionPool(config.DATABASE_URL)
+    await app_instance.state.db_pool.open()
     print("Toy S3 Service (SQLite Backend & Config File) started.")
     yield
     print("Application shutdown...")
+    await app_instance.state.db_pool.close()
 
 app = FastAPI(
     title="Toy S3 Service (SQLite & Config)",
@@ -50,6 +54,13 @@ app = FastAPI(
 app.include_router(buckets_router.router,dependencies=[Depends(verify_api_key)]) # This uses the prefix from buckets.py
 app.include_router(objects_router.router,dependencies=[Depends(verify_api_key)]) # This uses paths as defined in objects.py
 
+# Hot-path GET dispatch: a plain Starlette Route inserted ahead of the
+# APIRouter routes, so object downloads skip FastAPI's dependency-injection
+# and validation machinery entirely. The handler does its own auth and pulls
+# a pooled connection directly; the FastAPI route below it stays for OpenAPI.
+app.router.routes.insert(0, Route("/objects/{bucket_name}/{object_key:path}",
+                                  objects_router.get_object_raw, methods=["GET"]))
+
 
 # --- API Endpoints ---
 
@@ -62,4 +73,30 @@ async def root_status():
 
 if __name__ == "__main__":
     print("Starting server with uvicorn directly from script...")
-    uvicorn.run("app:app", host="0.0.0.0", port=3000, reload=True) 
\ No newline at end of file
+    # uvloop (libuv) and httptools (Node's http-parser) are both C
+    # implementations and measurably faster than the default asyncio loop and
+    # h11 parser. reload=True is a dev-only feature and incompatible with
+    # multiple workers.
+    # Workers default to 1: the metadata/body/bucket caches are process-local
+    # with no cross-process invalidation, so with several workers a write
+    # handled by one process leaves the others serving stale entries. Set
+    # WEB_CONCURRENCY to scale out only if that staleness is acceptable.
+    try:
+        import uvloop  # noqa: F401
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "auto" # e.g. Windows, where uvloop is unavailable
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=3000,
+        loop=loop_impl,
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+        backlog=2048,
+        # Shed load before the event loop drowns: beyond this many in-flight
+        # requests uvicorn answers 503 immediately instead of queueing work
+        # behind the disk-write limiter. Kept below backlog so the overflow
+        # waits in the accept queue rather than as live connections.
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", 1024)),
+    )
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import uuid
 import sqlite3
 import shutil
@@ -8,8 +9,11 @@ import uvicorn
 import hashlib 
 import mimetypes
 import config 
+import aiosqlite
 from fastapi.responses import StreamingResponse
-from shared import get_db
+from shared import (get_db, BUCKET_EXISTS_CACHE, BUCKET_NAME_RE, METADATA_CACHE,
+                    MISS_CACHE, OBJECT_DATA_CACHE, bucket_exists)
+from routers.objects import _unlink_if_unreferenced
 
 router = APIRouter(
     prefix="/buckets",  # Optional: prefix for all routes in this router
@@ -17,19 +21,19 @@ router = APIRouter(
 )
 
 @router.put("/{bucket_name}", status_code=status.HTTP_201_CREATED, tags=["Buckets"])
-async def create_bucket(bucket_name: str, db: sqlite3.Connection = Depends(get_db)):
-    if not bucket_name or not bucket_name.strip(): # Basic validation
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bucket name cannot be empty or just whitespace")
+async def create_bucket(bucket_name: str, db: aiosqlite.Connection = Depends(get_db)):
+    if not BUCKET_NAME_RE.match(bucket_name): # S3-style naming rules
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Invalid bucket name '{bucket_name}': must be 1-63 lowercase alphanumerics/hyphens, starting and ending alphanumeric")
 
-    cursor = db.cursor()
     try:
-        cursor.execute("INSERT INTO buckets (name) VALUES (?)", (bucket_name,))
-        db.commit()
-    except sqlite3.IntegrityError: 
-        db.rollback()
+        await db.execute("INSERT INTO buckets (name) VALUES (?)", (bucket_name,))
+        await db.commit()
+    except sqlite3.IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Bucket '{bucket_name}' already exists")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
 
     bucket_data_path = os.path.join(config.OBJECT_STORAGE_DIR, bucket_name)
@@ -43,23 +47,34 @@ async def create_bucket(bucket_name: str, db: sqlite3.Connection = Depends(get_d
     return {"message": f"Bucket '{bucket_name}' created successfully"}
 
 @router.get("/buckets", tags=["Buckets"])
-async def list_buckets_endpoint(db: sqlite3.Connection = Depends(get_db)):
-    cursor = db.cursor()
+async def list_buckets_endpoint(db: aiosqlite.Connection = Depends(get_db)):
     try:
-        cursor.execute("SELECT name, created_at FROM buckets ORDER BY created_at DESC")
-        buckets_data = cursor.fetchall() # Returns a list of Row objects
-        buckets_list = [{"name": row["name"], "created_at": row["created_at"]} for row in buckets_data]
+        # bucket_stats is kept up to date by triggers, so the per-bucket
+        # counts come back without scanning the objects table.
+        cursor = await db.execute("""
+            SELECT name, created_at, object_count, total_bytes, last_modified
+            FROM bucket_stats ORDER BY created_at DESC
+        """)
+        buckets_data = await cursor.fetchall() # Returns a list of Row objects
+        buckets_list = [
+            {
+                "name": row["name"],
+                "created_at": row["created_at"],
+                "object_count": row["object_count"],
+                "total_bytes": row["total_bytes"],
+                "last_modified": row["last_modified"]
+            }
+            for row in buckets_data
+        ]
         return {"buckets": buckets_list}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
 
 
 @router.head("/{bucket_name}", status_code=status.HTTP_200_OK, tags=["Buckets"])
-async def head_bucket(bucket_name: str, db: sqlite3.Connection = Depends(get_db)):
-    cursor = db.cursor()
+async def head_bucket(bucket_name: str, db: aiosqlite.Connection = Depends(get_db)):
     try:
-        cursor.execute("SELECT name FROM buckets WHERE name = ?", (bucket_name,))
-        bucket = cursor.fetchone()
+        bucket = await bucket_exists(db, bucket_name)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e}")
 
@@ -69,33 +84,63 @@ async def head_bucket(bucket_name: str, db: sqlite3.Connection = Depends(get_db)
 
 
 @router.delete("/{bucket_name}", status_code=status.HTTP_204_NO_CONTENT, tags=["Buckets"])
-async def delete_bucket_endpoint(bucket_name: str, db: sqlite3.Connection = Depends(get_db)):
-    cursor = db.cursor()
+async def delete_bucket_endpoint(bucket_name: str, db: aiosqlite.Connection = Depends(get_db)):
     try:
         # Check if bucket exists
-        cursor.execute("SELECT name FROM buckets WHERE name = ?", (bucket_name,))
-        bucket_exists = cursor.fetchone()
-        if not bucket_exists:
+        cursor = await db.execute("SELECT name FROM buckets WHERE name = ?", (bucket_name,))
+        bucket_row = await cursor.fetchone()
+        if not bucket_row:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Bucket '{bucket_name}' not found")
 
+        # One pass over the bucket's rows: every object_key needs its cache
+        # entries evicted, and content-addressed bodies may be shared with
+        # other buckets, so also flag the files that become unreferenced once
+        # this bucket's rows are cascade-deleted.
+        cursor = await db.execute("""
+            SELECT object_key, storage_path, etag,
+                   NOT EXISTS (
+                       SELECT 1 FROM objects o2
+                       WHERE o2.etag = o.etag AND o2.bucket_name != o.bucket_name
+                   ) AS orphaned
+            FROM objects o WHERE o.bucket_name = ?
+        """, (bucket_name,))
+        object_rows = await cursor.fetchall()
+        orphaned = {(row["etag"], row["storage_path"])
+                    for row in object_rows if row["orphaned"]}
+
+        await db.execute("DELETE FROM buckets WHERE name = ?", (bucket_name,))
+        await db.commit()
+        BUCKET_EXISTS_CACHE.pop(bucket_name, None) # Drop the stale existence entry
+
+        # Purge the per-object caches too, or the RAM body cache keeps serving
+        # this bucket's objects after the rows are gone - even into a
+        # re-created bucket of the same name.
+        for row in object_rows:
+            cache_key = (bucket_name, row["object_key"])
+            if cache_key in METADATA_CACHE:
+                del METADATA_CACHE[cache_key]
+            OBJECT_DATA_CACHE.pop(cache_key, None)
+            MISS_CACHE.pop(cache_key, None)
+
+        # Re-check under the etag stripe lock before unlinking: an in-flight
+        # PUT may have linked this content into another bucket since the
+        # SELECT above ran.
+        for etag, path in orphaned:
+            await _unlink_if_unreferenced(db, etag, path)
+
+        # Legacy per-bucket directory (pre content-addressing layouts)
         bucket_data_path = os.path.join(config.OBJECT_STORAGE_DIR, bucket_name)
-        if os.path.exists(bucket_data_path) and os.path.isdir(bucket_data_path):
-            try:
-                shutil.rmtree(bucket_data_path)
-                print(f"Deleted data directory for bucket: {bucket_data_path}")
-            except OSError as e:
-                print(f"Error deleting bucket data directory {bucket_data_path}: {e}")
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                                    detail=f"Could not delete bucket data directory: {e}. Bucket metadata not deleted.")
-
-        cursor.execute("DELETE FROM buckets WHERE name = ?", (bucket_name,))
-        db.commit()
-
-    except HTTPException: 
-        db.rollback() # Rollback any partial DB changes if an HTTPException occurred earlier
+        if os.path.isdir(bucket_data_path):
+            # rmtree stats/unlinks every file, so run it in a worker
+            # thread rather than freezing the event loop on big buckets
+            await asyncio.to_thread(shutil.rmtree, bucket_data_path)
+            print(f"Deleted data directory for bucket: {bucket_data_path}")
+
+    except HTTPException:
+        await db.rollback() # Rollback any partial DB changes if an HTTPException occurred earlier
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error or unexpected issue: {e}")
 
     return Response(status_code=status.HTTP_204_NO_CONTENT) 
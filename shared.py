@@ -1,18 +1,210 @@
 import os
+import asyncio
+import re
+import threading
 import config
 import sqlite3
-from cachetools import LRUCache
+import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import Request
+from cachetools import LRUCache, TTLCache
+
+#Frozen once at import so API-key membership tests are O(1) hash lookups even
+#if the config file defines the keys as a list. Shared by the dependency-based
+#auth in app.py and the raw hot-path route in routers/objects.py.
+ALLOWED_API_KEYS = frozenset(config.ALLOWED_API_KEYS)
+
+#Precompiled name validation shared by both routers. Bucket names follow the
+#S3 rules (1-63 chars, lowercase alphanumerics and hyphens, alphanumeric at
+#both ends); object keys are any NUL-free string up to 1024 chars that does
+#not start with '/'. A compiled pattern scans in one pass with no per-request
+#recompilation.
+BUCKET_NAME_RE = re.compile(r"\A(?=.{1,63}\Z)[a-z0-9]([a-z0-9-]*[a-z0-9])?\Z")
+OBJECT_KEY_RE = re.compile(r"\A[^\x00/][^\x00]{0,1023}\Z")
+
+class ShardedLRU:
+    """
+    LRU cache striped across 64 independently locked shards. Endpoints run on
+    both the event loop and worker threads, so cache access has to be
+    thread-safe; sharding by key hash keeps threads from serializing on one
+    global lock (and bouncing one hot dict's cache lines between cores) the
+    way a single locked cachetools.LRUCache would.
+    """
+
+    _SHARD_COUNT = 64 # Power of two so shard selection is a mask, not a mod
+
+    def __init__(self, maxsize: int):
+        self._per_shard = max(1, maxsize // self._SHARD_COUNT)
+        self._shards = [(threading.Lock(), OrderedDict())
+                        for _ in range(self._SHARD_COUNT)]
+
+    def _shard(self, key):
+        return self._shards[hash(key) & (self._SHARD_COUNT - 1)]
+
+    def __contains__(self, key):
+        lock, data = self._shard(key)
+        with lock:
+            return key in data
+
+    def __getitem__(self, key):
+        lock, data = self._shard(key)
+        with lock:
+            value = data[key]
+            data.move_to_end(key) # Mark most-recently-used
+            return value
+
+    def __setitem__(self, key, value):
+        lock, data = self._shard(key)
+        with lock:
+            data[key] = value
+            data.move_to_end(key)
+            if len(data) > self._per_shard:
+                data.popitem(last=False) # Evict this shard's LRU entry
+
+    def __delitem__(self, key):
+        lock, data = self._shard(key)
+        with lock:
+            del data[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=None):
+        lock, data = self._shard(key)
+        with lock:
+            return data.pop(key, default)
+
 
 #DEFINE CACHE FOR OBJECT METADATA
-METADATA_CACHE = LRUCache(maxsize=config.OBJECT_METADATA_CACHE_SIZE)
+METADATA_CACHE = ShardedLRU(maxsize=config.OBJECT_METADATA_CACHE_SIZE)
+
+#RAM cache of small, hot object bodies keyed by (bucket, key) ->
+#(etag, content_type, body). The cache is sized by total bytes held rather
+#than entry count, and objects above OBJECT_DATA_CACHE_MAX_ENTRY bypass it so
+#a single large download cannot evict the whole working set.
+OBJECT_DATA_CACHE_MAX_ENTRY = 1 << 20 # 1 MiB
+OBJECT_DATA_CACHE = LRUCache(maxsize=256 * 1024 * 1024,
+                             getsizeof=lambda entry: len(entry[2]))
+
+#Negative cache for GETs of keys that don't exist: repeated probes for the
+#same missing object are answered from memory instead of re-querying SQLite.
+#The TTL is deliberately tiny and PUTs evict eagerly, so a newly created
+#object is never shadowed by a stale miss for long.
+MISS_CACHE = TTLCache(maxsize=8192, ttl=2)
+
+#Buckets are created/deleted rarely but their existence is checked on every
+#object PUT, so positive lookups are cached with a short TTL. Only True is
+#cached; a miss always goes to the database so new buckets show up instantly.
+BUCKET_EXISTS_CACHE = TTLCache(maxsize=4096, ttl=60)
+
+
+async def bucket_exists(db, bucket_name: str) -> bool:
+    """Checks bucket existence, serving repeat lookups from the TTL cache."""
+    if bucket_name in BUCKET_EXISTS_CACHE:
+        return True
+    cursor = await db.execute("SELECT 1 FROM buckets WHERE name = ?", (bucket_name,))
+    row = await cursor.fetchone()
+    if row:
+        BUCKET_EXISTS_CACHE[bucket_name] = True
+    return row is not None
+
+#Number of pooled SQLite connections kept open for the lifetime of the app
+DB_POOL_SIZE = 5
+
+#Hot-path statements registered by the routers at import time. The pool's
+#connection factory compiles each one into the connection's statement cache
+#at startup, so the first real request never pays the SQL tokenizer/parser.
+PREPARED_SQL: list = []
+
+
+class SQLiteConnectionPool:
+    """
+    Simple asyncio pool of aiosqlite connections.
+    Connections are created once at startup and reused across requests, so we
+    avoid paying the connect/teardown cost per request and SQLite's page cache
+    stays hot between queries.
+    """
+
+    def __init__(self, database_url: str, size: int = DB_POOL_SIZE):
+        self._database_url = database_url
+        self._size = size
+        self._connections: asyncio.Queue = asyncio.Queue(maxsize=size)
+
+    async def _create_connection(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self._database_url, cached_statements=256)
+        conn.row_factory = aiosqlite.Row
+        # WAL is persistent on the database file, but the rest are
+        # per-connection, so they must be re-applied on every new connection.
+        # mmap_size lets reads resolve as loads from mapped pages instead of
+        # read() copies into the page cache.
+        await conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-65536;
+            PRAGMA mmap_size=268435456;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA foreign_keys=ON;
+        """)
+        # Warm the statement cache: the cache is keyed by exact SQL text, so
+        # each registered statement is executed once with dummy parameters
+        # inside a rolled-back savepoint. Compilation (the expensive part)
+        # happens before binding, so constraint errors here are harmless.
+        await conn.execute("SAVEPOINT warmup")
+        for sql in PREPARED_SQL:
+            try:
+                await conn.execute(sql, ("",) * sql.count("?"))
+            except sqlite3.Error:
+                pass
+        await conn.execute("ROLLBACK TO warmup")
+        await conn.execute("RELEASE warmup")
+        return conn
+
+    async def open(self):
+        for _ in range(self._size):
+            await self._connections.put(await self._create_connection())
+        print(f"SQLite connection pool opened with {self._size} connections")
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self._connections.get()
+        try:
+            yield conn
+        finally:
+            await self._connections.put(conn)
+
+    async def close(self):
+        while not self._connections.empty():
+            conn = await self._connections.get()
+            await conn.close()
+        print("SQLite connection pool closed")
 
 
 def init_db():
     """Initializes the database and creates tables if they don't exist."""
-    os.makedirs(config.METADATA_DIR, exist_ok=True) 
-    os.makedirs(config.OBJECT_STORAGE_DIR, exist_ok=True) 
+    os.makedirs(config.METADATA_DIR, exist_ok=True)
+    os.makedirs(config.OBJECT_STORAGE_DIR, exist_ok=True)
+    # Content-addressed storage: uploads land in tmp/ while being hashed and
+    # are then hard-linked into cas/<etag[:2]>/<etag>, deduplicating identical
+    # bodies across keys and buckets.
+    os.makedirs(os.path.join(config.OBJECT_STORAGE_DIR, "tmp"), exist_ok=True)
+    os.makedirs(os.path.join(config.OBJECT_STORAGE_DIR, "cas"), exist_ok=True)
     conn = sqlite3.connect(config.DATABASE_URL)
     cursor = conn.cursor()
+    # WAL lets readers proceed concurrently with writers and batches fsyncs,
+    # so commits on the PUT path no longer block the read endpoints. WAL is
+    # persistent on the database file; the per-connection pragmas (synchronous,
+    # cache_size) are re-applied in the pool's connection factory above.
+    cursor.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+    """)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS buckets (
             name TEXT PRIMARY KEY,
@@ -34,17 +226,71 @@ def init_db():
             UNIQUE (bucket_name, object_key) -- Ensures object keys are unique within a bucket
         )
     """)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_bucket_key ON objects (bucket_name, object_key)")
+    # The UNIQUE (bucket_name, object_key) constraint already creates its own
+    # index, so the old idx_objects_bucket_key was a duplicate that every PUT
+    # had to update for nothing. Replace it with a covering index that also
+    # holds the columns get_object selects, so lookups never touch the table.
+    cursor.execute("DROP INDEX IF EXISTS idx_objects_bucket_key")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_obj_cover ON objects
+        (bucket_name, object_key, storage_path, content_type, etag, size_bytes)
+    """)
+    # Content files are shared between rows with the same etag; deletes
+    # refcount via COUNT(*) on etag, which this index answers without a scan.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_etag ON objects (etag)")
+
+    # Materialized per-bucket stats, maintained incrementally by triggers so
+    # listing buckets never has to aggregate over the objects table.
+    cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS bucket_stats (
+            name TEXT PRIMARY KEY,
+            created_at TIMESTAMP,
+            object_count INTEGER NOT NULL DEFAULT 0,
+            total_bytes INTEGER NOT NULL DEFAULT 0,
+            last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (name) REFERENCES buckets(name) ON DELETE CASCADE
+        );
+        CREATE TRIGGER IF NOT EXISTS buckets_ai AFTER INSERT ON buckets BEGIN
+            INSERT INTO bucket_stats (name, created_at) VALUES (NEW.name, NEW.created_at);
+        END;
+        CREATE TRIGGER IF NOT EXISTS buckets_ad AFTER DELETE ON buckets BEGIN
+            DELETE FROM bucket_stats WHERE name = OLD.name;
+        END;
+        CREATE TRIGGER IF NOT EXISTS objects_ai AFTER INSERT ON objects BEGIN
+            UPDATE bucket_stats
+            SET object_count = object_count + 1,
+                total_bytes = total_bytes + NEW.size_bytes,
+                last_modified = CURRENT_TIMESTAMP
+            WHERE name = NEW.bucket_name;
+        END;
+        CREATE TRIGGER IF NOT EXISTS objects_ad AFTER DELETE ON objects BEGIN
+            UPDATE bucket_stats
+            SET object_count = object_count - 1,
+                total_bytes = total_bytes - OLD.size_bytes,
+                last_modified = CURRENT_TIMESTAMP
+            WHERE name = OLD.bucket_name;
+        END;
+        CREATE TRIGGER IF NOT EXISTS objects_au AFTER UPDATE OF size_bytes ON objects BEGIN
+            UPDATE bucket_stats
+            SET total_bytes = total_bytes - OLD.size_bytes + NEW.size_bytes,
+                last_modified = CURRENT_TIMESTAMP
+            WHERE name = NEW.bucket_name;
+        END;
+    """)
+    # Backfill stats for buckets that predate this table
+    cursor.execute("""
+        INSERT OR IGNORE INTO bucket_stats (name, created_at, object_count, total_bytes)
+        SELECT b.name, b.created_at,
+               COUNT(o.id), COALESCE(SUM(o.size_bytes), 0)
+        FROM buckets b LEFT JOIN objects o ON o.bucket_name = b.name
+        GROUP BY b.name
+    """)
 
     conn.commit()
     conn.close()
     print(f"Database initialized/checked at {config.DATABASE_URL}")
 
-def get_db():
-    """FastAPI dependency to get a database connection."""
-    db = sqlite3.connect(config.DATABASE_URL,check_same_thread=False)
-    db.row_factory = sqlite3.Row 
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db(request: Request):
+    """FastAPI dependency to get a pooled database connection."""
+    async with request.app.state.db_pool.connection() as conn:
+        yield conn